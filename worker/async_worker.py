@@ -0,0 +1,422 @@
+"""
+StudyPal Async PDF Worker
+Serves the same API as worker.py on an asyncio event loop.
+
+Upload receipt and callback delivery are non-blocking (aiohttp server and a
+pooled aiohttp client session) while PDF parsing and chunking run in a
+process pool, so one node can keep many uploads and callbacks in flight.
+
+Run with: python async_worker.py
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from aiohttp import web, ClientSession, ClientTimeout, TCPConnector
+from dotenv import load_dotenv
+from job_store import JobStore
+from pipeline import parse_and_chunk
+
+load_dotenv()
+
+CALLBACK_URL = os.getenv('CALLBACK_URL', 'http://localhost:3001/api/callback')
+CALLBACK_SECRET = os.getenv('CALLBACK_SECRET', 'dev-secret-key')
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
+
+# Parsing processes (defaults to one per CPU) and pooled callback connections
+PARSE_PROCESSES = int(os.getenv('PARSE_PROCESSES') or os.cpu_count() or 1)
+CALLBACK_CONNECTIONS = int(os.getenv('CALLBACK_CONNECTIONS', 100))
+
+# Optional shared job store, same settings as worker.py
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH')
+JOB_CONSUMERS = int(os.getenv('JOB_CONSUMERS', PARSE_PROCESSES))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 120))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Ensure upload directory exists
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+POOL = web.AppKey('pool', object)
+SESSION = web.AppKey('session', ClientSession)
+STORE = web.AppKey('store', object)
+TASKS = web.AppKey('tasks', list)
+
+routes = web.RouteTableDef()
+
+
+@routes.get('/health')
+async def health(request):
+    """Health check endpoint"""
+    broken = request.app[POOL].broken
+    body = {
+        'status': 'degraded' if broken else 'ok',
+        'service': 'studypal-worker',
+        'mode': 'async',
+        'pool': 'broken' if broken else 'ok'
+    }
+    store = request.app[STORE]
+    if store:
+        body['queue'] = await asyncio.to_thread(store.stats)
+    return web.json_response(body, status=503 if broken else 200)
+
+
+@routes.post('/parse')
+async def parse_pdf(request):
+    """
+    Parse a PDF file and extract text chunks.
+
+    Accepts the same JSON or multipart payloads as worker.py.
+    """
+    app = request.app
+    job_id = None
+    callback_url = CALLBACK_URL
+    callback_secret = CALLBACK_SECRET
+
+    try:
+        pdf_path = None
+
+        # Handle JSON payload (file path reference)
+        if request.content_type == 'application/json':
+            data = await request.json()
+            job_id = data.get('jobId')
+            pdf_path = data.get('filePath')
+            callback_url = data.get('callbackUrl', CALLBACK_URL)
+            callback_secret = data.get('callbackSecret', CALLBACK_SECRET)
+
+        # Handle multipart form (direct file upload), streamed to disk
+        elif request.content_type.startswith('multipart/'):
+            form = {}
+            upload_path = None
+            try:
+                reader = await request.multipart()
+                async for field in reader:
+                    if field.name == 'pdf':
+                        # Field order is up to the client, so save under a
+                        # temporary name until jobId is known; a repeated
+                        # pdf field replaces the earlier one
+                        discard_upload(upload_path)
+                        upload_path = os.path.join(UPLOAD_DIR, f"upload-{uuid.uuid4().hex}.part")
+                        await save_upload(field, upload_path)
+                    else:
+                        form[field.name] = await field.text()
+
+                job_id = form.get('jobId')
+                if upload_path:
+                    if not job_id:
+                        return web.json_response({'error': 'jobId required'}, status=400)
+                    pdf_path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+                    os.replace(upload_path, pdf_path)
+                    upload_path = None
+                    print(f"[Worker] PDF saved to {pdf_path}", flush=True)
+            finally:
+                # Client disconnects, write errors and early returns leave
+                # the temporary file behind otherwise
+                discard_upload(upload_path)
+            # Prioritize env var over form data (form data might have wrong localhost URL)
+            form_callback_url = form.get('callbackUrl')
+            if form_callback_url and 'localhost' not in form_callback_url and '127.0.0.1' not in form_callback_url:
+                callback_url = form_callback_url
+            callback_secret = form.get('callbackSecret', CALLBACK_SECRET)
+            print(f"[Worker] Callback URL: {callback_url} (from form: {form_callback_url}, env: {CALLBACK_URL})", flush=True)
+
+        if not job_id:
+            return web.json_response({'error': 'jobId required'}, status=400)
+
+        if not pdf_path or not os.path.exists(pdf_path):
+            # Try looking in local uploads
+            local_path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+            if os.path.exists(local_path):
+                pdf_path = local_path
+            else:
+                await send_error_callback(app, job_id, callback_url, callback_secret, 'PDF file not found')
+                return web.json_response({'error': 'PDF file not found'}, status=404)
+
+        # Hand off to the shared queue; any node may pick it up
+        store = app[STORE]
+        if store:
+            await asyncio.to_thread(store.enqueue, job_id, {
+                'filePath': pdf_path,
+                'callbackUrl': callback_url,
+                'callbackSecret': callback_secret
+            })
+            print(f"[Worker] Job {job_id} queued in {JOB_STORE_PATH}", flush=True)
+            return web.json_response({
+                'success': True,
+                'jobId': job_id,
+                'status': 'queued'
+            }, status=202)
+
+        body, status_code = await process_job(app, job_id, pdf_path, callback_url, callback_secret)
+        return web.json_response(body, status=status_code)
+
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"[Worker] ERROR processing PDF: {e}", flush=True)
+        print(f"[Worker] Traceback: {error_trace}", flush=True)
+        if job_id:
+            await send_error_callback(app, job_id, callback_url, callback_secret, str(e))
+        return web.json_response({'error': str(e), 'traceback': error_trace}, status=500)
+
+
+async def save_upload(field, path):
+    """Stream a multipart file field to disk without blocking the loop"""
+    with open(path, 'wb') as f:
+        while True:
+            chunk = await field.read_chunk(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(f.write, chunk)
+
+
+def discard_upload(path):
+    """Remove a temporary upload file, if there is one"""
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def process_job(app, job_id, pdf_path, callback_url, callback_secret, still_leased=None):
+    """
+    Parse and chunk in the process pool, then deliver the callback.
+
+    Returns a (response body, status code) pair. Unexpected exceptions are
+    left to the caller so the queue consumer can retry them. still_leased
+    is an async check as in worker.process_job.
+    """
+    result = await app[POOL].run(parse_and_chunk, job_id, pdf_path)
+
+    if still_leased and not await still_leased():
+        return {'jobId': job_id, 'leaseLost': True}, 409
+
+    if result.get('error'):
+        await send_error_callback(app, job_id, callback_url, callback_secret, result['error'])
+        return {'error': result['error']}, 422
+
+    chunks = result['chunks']
+    response_data = {
+        'jobId': job_id,
+        'metadata': result['metadata'],
+        'chunks': chunks,
+        'status': 'success',
+        'secret': callback_secret
+    }
+
+    print(f"[Worker] Sending callback to {callback_url}")
+    delivered = await send_callback(app, callback_url, response_data)
+
+    return {
+        'success': True,
+        'jobId': job_id,
+        'chunkCount': len(chunks),
+        'callbackDelivered': delivered
+    }, 200
+
+
+class ParsePool:
+    """
+    Process pool for parsing that survives dead processes.
+
+    If a parse process dies (e.g. OOM-killed on a huge PDF) the whole
+    ProcessPoolExecutor breaks. The executor is then replaced so later jobs
+    run, and the jobs that were in it fail with PARSER_CRASHED. They are not
+    retried here: one of them may be what killed the process, and the queue
+    consumer already retries failures.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.executor = self._create_executor()
+        self.lock = asyncio.Lock()
+
+    def _create_executor(self):
+        # spawn, not fork: the loop already runs threads for to_thread calls
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    @property
+    def broken(self):
+        """True once a process has died and the executor refuses new work"""
+        return bool(getattr(self.executor, '_broken', False))
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in a worker process"""
+        executor = self.executor
+        if self.broken:
+            executor = await self._replace(executor)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool as e:
+            await self._replace(executor)
+            raise RuntimeError('PARSER_CRASHED: parse process exited unexpectedly') from e
+
+    async def _replace(self, broken):
+        """Swap in a new executor, unless another job already replaced this one"""
+        async with self.lock:
+            if self.executor is broken:
+                print("[Worker] Parse pool broken, starting a new one", flush=True)
+                self.executor = self._create_executor()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self.executor
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def send_callback(app, url, data):
+    """Send parsed data to backend callback. Returns True on success."""
+    try:
+        print(f"[Callback] Sending POST to {url}, chunks: {len(data.get('chunks', []))}")
+        async with app[SESSION].post(url, json=data, timeout=ClientTimeout(total=60)) as response:
+            print(f"[Callback] Response status: {response.status}")
+            response.raise_for_status()
+        print(f"[Callback] Callback sent successfully for job {data.get('jobId')}")
+        return True
+    except Exception as e:
+        print(f"[Callback] Callback failed: {e}")
+        return False
+
+
+async def send_error_callback(app, job_id, url, secret, error_message):
+    """Send error callback to backend"""
+    try:
+        async with app[SESSION].post(url, json={
+            'jobId': job_id,
+            'status': 'error',
+            'error': error_message,
+            'secret': secret
+        }, timeout=ClientTimeout(total=30)):
+            pass
+    except Exception as e:
+        print(f"Error callback failed: {e}")
+
+
+async def run_job_consumer(app, worker_id):
+    """
+    Lease jobs from the shared store and process them.
+
+    Mirrors worker.run_job_consumer: failures are retried up to
+    JOB_MAX_ATTEMPTS.
+    """
+    store = app[STORE]
+    print(f"[Queue] Consumer {worker_id} polling {JOB_STORE_PATH}", flush=True)
+    while True:
+        try:
+            for dead in await asyncio.to_thread(store.reap_expired):
+                print(f"[Queue] Job {dead['jobId']} lease expired after {dead['attempts']} attempts", flush=True)
+                await send_error_callback(app, dead['jobId'], dead['callbackUrl'], dead['callbackSecret'], 'LEASE_EXPIRED')
+
+            job = await asyncio.to_thread(store.lease, worker_id)
+        except Exception as e:
+            print(f"[Queue] Store unavailable: {e}", flush=True)
+            job = None
+
+        if not job:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+
+        print(f"[Queue] {worker_id} leased job {job['jobId']} (attempt {job['attempts']}/{JOB_MAX_ATTEMPTS})", flush=True)
+        await run_leased_job(app, job, worker_id)
+
+
+async def run_leased_job(app, job, worker_id):
+    """Process one leased job; mirrors worker.run_leased_job with a heartbeat task"""
+    store = app[STORE]
+    job_id = job['jobId']
+    lost = asyncio.Event()
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(JOB_VISIBILITY_TIMEOUT / 3)
+            if not await asyncio.to_thread(store.heartbeat, job_id, worker_id):
+                print(f"[Queue] Lost lease on job {job_id}", flush=True)
+                lost.set()
+                return
+
+    async def still_leased():
+        # Renew once more before calling back: the lease can lapse
+        # between heartbeats and the job may already run elsewhere
+        if not lost.is_set() and not await asyncio.to_thread(store.heartbeat, job_id, worker_id):
+            lost.set()
+        return not lost.is_set()
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        body, _ = await process_job(
+            app, job_id, job['filePath'], job['callbackUrl'], job['callbackSecret'], still_leased
+        )
+        if body.get('leaseLost'):
+            print(f"[Queue] Job {job_id} taken over by another node, callback skipped", flush=True)
+            return
+        if body.get('callbackDelivered') is False:
+            raise RuntimeError('Callback delivery failed')
+        if not await asyncio.to_thread(store.complete, job_id, worker_id):
+            print(f"[Queue] Lost lease on job {job_id} after its callback was sent", flush=True)
+    except Exception as e:
+        print(f"[Queue] Job {job_id} failed: {e}", flush=True)
+        retry = await asyncio.to_thread(store.fail, job_id, worker_id, str(e))
+        if retry is None:
+            print(f"[Queue] Job {job_id} taken over by another node, error callback skipped", flush=True)
+        elif not retry:
+            await send_error_callback(app, job_id, job['callbackUrl'], job['callbackSecret'], str(e))
+    finally:
+        beat.cancel()
+
+
+async def on_startup(app):
+    app[POOL] = ParsePool(PARSE_PROCESSES)
+    app[SESSION] = ClientSession(connector=TCPConnector(limit=CALLBACK_CONNECTIONS))
+    app[TASKS] = []
+    if app[STORE]:
+        for i in range(JOB_CONSUMERS):
+            worker_id = f"{socket.gethostname()}-{os.getpid()}-async-{i}"
+            app[TASKS].append(asyncio.create_task(run_job_consumer(app, worker_id)))
+
+
+async def on_cleanup(app):
+    for task in app[TASKS]:
+        task.cancel()
+    await asyncio.gather(*app[TASKS], return_exceptions=True)
+    await app[SESSION].close()
+    app[POOL].shutdown()
+
+
+def create_app():
+    """Build the aiohttp application"""
+    # client_max_size only caps buffered reads (JSON, form text fields);
+    # the PDF itself is streamed to disk in save_upload
+    app = web.Application()
+    app[STORE] = None
+    if JOB_STORE_PATH:
+        app[STORE] = JobStore(
+            JOB_STORE_PATH,
+            visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+            max_attempts=JOB_MAX_ATTEMPTS
+        )
+    app.add_routes(routes)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
+    print(f"==============================")
+    print(f"   StudyPal PDF Worker (async)")
+    print(f"   Status: Running")
+    print(f"   Port:   {port}")
+    print(f"   Parse processes: {PARSE_PROCESSES}")
+    print(f"==============================")
+    web.run_app(create_app(), host='0.0.0.0', port=port)
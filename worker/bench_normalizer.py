@@ -0,0 +1,74 @@
+"""
+Normalizer Benchmark
+Compares TextNormalizer with the previous multi-pass regex cleanup.
+Run with: python bench_normalizer.py
+"""
+
+import re
+import time
+from text_normalizer import TextNormalizer, is_heading
+
+
+def legacy_headings(page_text, page):
+    """Previous PDFParser heading scan: split and strip every line"""
+    headings = []
+    for line in page_text.split('\n'):
+        clean_line = line.strip()
+        if is_heading(clean_line):
+            headings.append({'text': clean_line, 'page': page})
+    return headings
+
+
+def legacy_clean(text):
+    """Previous TextChunker._clean_text: four full-document re.sub passes"""
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r' {2,}', ' ', text)
+    text = re.sub(r'\n\d+\n', '\n', text)
+    text = re.sub(r'Page \d+ of \d+', '', text)
+    return text.strip()
+
+
+def make_pages(count=100):
+    """Synthetic lecture deck with typical extraction artifacts"""
+    page = (
+        "CHAPTER {n} OVERVIEW\n"
+        "The  e\ufb03cient algo-\nrithm runs in linear time and is \ufb02exible  enough\n"
+        "for most workloads discussed in this section.\n\n\n\n"
+        "1. Definitions\n"
+        "A data structure organizes information for fast access.\n" * 6
+        + "{n}\nPage {n} of {count}\n"
+    )
+    return [page.format(n=n, count=count) for n in range(1, count + 1)]
+
+
+def bench(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<12} {elapsed * 1000:8.2f} ms/document")
+    return elapsed
+
+
+if __name__ == '__main__':
+    pages = make_pages()
+    normalizer = TextNormalizer()
+
+    def legacy():
+        headings = []
+        for i, page in enumerate(pages):
+            headings.extend(legacy_headings(page, i + 1))
+        return legacy_clean('\n\n'.join(pages)), headings
+
+    def normalizer_run():
+        text, headings = [], []
+        for i, page in enumerate(pages):
+            page_text, page_headings = normalizer.normalize_page(page, i + 1)
+            text.append(page_text)
+            headings.extend(page_headings)
+        return '\n\n'.join(text), headings
+
+    old = bench('multi-pass', legacy)
+    new = bench('normalizer', normalizer_run)
+    print(f"speedup      {old / new:8.2f}x")
+    print(f"words        {len(legacy()[0].split())} -> {len(normalizer_run()[0].split())}")
@@ -0,0 +1,219 @@
+"""
+Chunk Compressor Module
+Trims chunks to their most central sentences before they reach the LLM.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+SENTENCE_END = ('.', '!', '?', '."', '?"', '!"')
+BULLET_PATTERN = re.compile(r'^(?:[\u2022\u25aa\u25cf\u2013\-*>]|\d+[.)])\s')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]{3,}')
+
+# Lines kept verbatim as headings. Unlike text_normalizer.is_heading this is
+# case-sensitive: its ALL CAPS branch would also match sentence-case lines
+# such as "Graphs are everywhere" and pin them outside the ranking.
+HEADING_LINE = re.compile(
+    r'^(?:'
+    r'[A-Z][A-Z0-9\s&:,\-]{3,}$'  # ALL CAPS
+    r'|(?:Chapter|Section|Part)\s+\d+'  # Chapter/Section numbers
+    r'|\d+\.\s+[A-Z]'  # Numbered headings
+    r'|[IVX]+\.\s+'  # Roman numerals
+    r')'
+)
+
+STOPWORDS = frozenset("""
+    the and for are but not you all any can had her was one our out has him
+    his how its may new now see two who did get let say she too use that with
+    have this will your from they been more when what were which their there
+    than then them these some would into also such only each other about
+""".split())
+
+
+class ChunkCompressor:
+    """Extractive compression of chunks with TF-IDF TextRank (NumPy)"""
+
+    def __init__(self, ratio: float = 0.6, min_sentences: int = 4,
+                 redundancy_threshold: float = 0.5):
+        """
+        Initialize compressor.
+
+        Args:
+            ratio: Target fraction of sentence words to keep per chunk
+            min_sentences: Chunks with fewer sentences are left untouched
+            redundancy_threshold: Skip sentences this similar to one already kept
+                (TF-IDF cosine; reworded examples typically score 0.6-0.7)
+        """
+        if not 0 < ratio <= 1:
+            raise ValueError(f"ratio must be in (0, 1], got {ratio!r}")
+        self.ratio = ratio
+        self.min_sentences = min_sentences
+        self.redundancy_threshold = redundancy_threshold
+
+    def compress(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Compress chunk text in place of the originals.
+
+        Headings and sentence order are preserved. Each chunk gets
+        originalWordCount alongside its (compressed) wordCount.
+
+        Args:
+            chunks: Chunks from TextChunker
+
+        Returns:
+            The same chunks with trimmed text and updated metadata
+        """
+        for chunk in chunks:
+            original_words = len(chunk['text'].split())
+            chunk['text'] = self.compress_text(chunk['text'])
+            chunk['originalWordCount'] = original_words
+            chunk['wordCount'] = len(chunk['text'].split())
+        return chunks
+
+    def compress_text(self, text: str) -> str:
+        """Keep the highest-ranked sentences of one chunk, in original order"""
+        units = self._segment(text)
+        sentences = [i for i, unit in enumerate(units) if not unit[3]]
+        if len(sentences) < self.min_sentences:
+            return text
+
+        import numpy as np
+
+        vectors = self._tfidf([units[i][2] for i in sentences])
+        if vectors is None:
+            return text
+        scores = self._textrank(vectors @ vectors.T)
+
+        lengths = [len(units[i][2].split()) for i in sentences]
+        budget = self.ratio * sum(lengths)
+        kept = []
+        used = 0
+        for j in np.argsort(-scores, kind='stable'):
+            if used >= budget:
+                break
+            if kept and (vectors[kept] @ vectors[j]).max() > self.redundancy_threshold:
+                continue
+            kept.append(j)
+            used += lengths[j]
+
+        keep = {sentences[j] for j in kept}
+        # Keep a heading only if some of its section survived (or it had none)
+        with_body = {units[i][1] for i in sentences}
+        kept_sections = {units[i][1] for i in keep}
+        keep.update(
+            i for i, (_, section, _, fixed, _) in enumerate(units)
+            if fixed and (section in kept_sections or section not in with_body)
+        )
+        return self._assemble(units, keep)
+
+    def _segment(self, text: str) -> List[Tuple[int, int, str, bool, bool]]:
+        """
+        Split text into (paragraph, section, text, is_heading, starts_line) units.
+
+        Wrapped lines (next line starting in lowercase) are joined first,
+        then split into sentences. Any other line break starts a new unit,
+        so unpunctuated slide bullets are ranked one by one.
+
+        A heading's section is its own paragraph, or the paragraphs up to
+        the next heading when the heading stands alone.
+        """
+        units = []
+        section = 0
+        spans = False  # Current heading stood alone, so it owns later paragraphs
+        for p, paragraph in enumerate(text.split('\n\n')):
+            if not spans:
+                section += 1
+            has_heading = False
+            blocks = []
+            lines = [line.strip() for line in paragraph.split('\n') if line.strip()]
+            for n, line in enumerate(lines):
+                # Short heading-like lines opening a paragraph are always kept,
+                # unless the next line carries on the same sentence or the
+                # line is the first item of a numbered list
+                following = lines[n + 1] if n + 1 < len(lines) else ''
+                wraps = following[:1].islower()
+                listed = BULLET_PATTERN.match(line) and BULLET_PATTERN.match(following)
+                if (not blocks and not has_heading and not wraps and not listed
+                        and len(line.split()) <= 12 and HEADING_LINE.match(line)):
+                    section += 1
+                    has_heading = True
+                    units.append((p, section, line, True, True))
+                    continue
+                continues = (
+                    blocks and line[0].islower()
+                    and not blocks[-1].endswith(SENTENCE_END)
+                    and not BULLET_PATTERN.match(line)
+                )
+                if continues:
+                    blocks[-1] += ' ' + line
+                else:
+                    blocks.append(line)
+
+            if has_heading:
+                spans = not blocks
+
+            for block in blocks:
+                for k, sentence in enumerate(SENTENCE_SPLIT.split(block)):
+                    if sentence:
+                        units.append((p, section, sentence, False, k == 0))
+        return units
+
+    def _tfidf(self, sentences: List[str]):
+        """L2-normalised TF-IDF matrix (sentences x terms), or None if empty"""
+        import numpy as np
+
+        vocab = {}
+        rows = []
+        for sentence in sentences:
+            tokens = [t for t in TOKEN_PATTERN.findall(sentence.lower()) if t not in STOPWORDS]
+            rows.append([vocab.setdefault(t, len(vocab)) for t in tokens])
+        if not vocab:
+            return None
+
+        tf = np.zeros((len(sentences), len(vocab)))
+        for i, ids in enumerate(rows):
+            np.add.at(tf[i], ids, 1.0)
+
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+        matrix = tf * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _textrank(self, similarity, damping: float = 0.85, iterations: int = 50):
+        """PageRank over the sentence similarity graph"""
+        import numpy as np
+
+        n = similarity.shape[0]
+        np.fill_diagonal(similarity, 0.0)
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        out_weight[out_weight == 0] = 1.0
+        transition = similarity / out_weight
+
+        scores = np.full(n, 1.0 / n)
+        for _ in range(iterations):
+            updated = (1 - damping) / n + damping * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < 1e-6:
+                return updated
+            scores = updated
+        return scores
+
+    def _assemble(self, units: List[Tuple[int, int, str, bool, bool]], keep: set) -> str:
+        """Rebuild text from kept units, keeping paragraph and line breaks"""
+        paragraphs = []
+        current = None
+        for i, (p, _, sentence, _, starts_line) in enumerate(units):
+            if i not in keep:
+                continue
+            if p != current:
+                paragraphs.append([])
+                current = p
+            lines = paragraphs[-1]
+            if starts_line or not lines:
+                lines.append(sentence)
+            else:
+                lines[-1] += ' ' + sentence
+        return '\n\n'.join('\n'.join(lines) for lines in paragraphs)
@@ -0,0 +1,265 @@
+"""
+Job Store Module
+Durable SQLite lease table shared by every worker node.
+
+Jobs are enqueued by whichever node receives the upload and leased by
+whichever node is free. A lease must be renewed with heartbeats; once it
+expires the job becomes visible again and another node can pick it up.
+"""
+
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class JobStore:
+    """Shared job queue with leases, heartbeats and retry counts"""
+
+    def __init__(self, db_path: str, visibility_timeout: int = 120,
+                 max_attempts: int = 3, retry_delay: int = 5):
+        """
+        Initialize the store, creating the table if needed.
+
+        Args:
+            db_path: SQLite file on a volume reachable by all workers
+            visibility_timeout: Seconds a lease lasts without a heartbeat
+            max_attempts: Leases granted per job before it is marked failed
+            retry_delay: Base back-off in seconds before a failed job is retried
+        """
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    available_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, available_at)'
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements inside a write-locked transaction"""
+        # Autocommit mode so BEGIN IMMEDIATE takes the write lock up front;
+        # this is what makes lease() safe across processes and containers.
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _read(self):
+        """Open a connection for reads; no write lock, so it never waits on lease()"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, job_id: str, payload: Dict) -> bool:
+        """
+        Add a job to the queue.
+
+        Re-submitting a finished or failed job queues it again; re-submitting
+        a job that is still queued or leased is ignored.
+
+        Returns:
+            True if the job was (re)queued
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO jobs (job_id, payload, status, attempts, available_at, created_at, updated_at)
+                VALUES (?, ?, 'queued', 0, ?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET
+                    payload = excluded.payload,
+                    status = 'queued',
+                    attempts = 0,
+                    lease_owner = NULL,
+                    lease_expires = NULL,
+                    available_at = excluded.available_at,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE jobs.status IN ('done', 'failed')
+            """, (job_id, json.dumps(payload), now, now, now))
+            return cursor.rowcount == 1
+
+    def lease(self, worker_id: str) -> Optional[Dict]:
+        """
+        Claim the oldest available job for this worker.
+
+        Available means queued and past its retry delay, or leased by a
+        node whose lease has expired and with attempts remaining.
+
+        Returns:
+            Job dict (jobId, attempts and payload fields) or None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT job_id, payload, attempts FROM jobs
+                WHERE (status = 'queued' AND available_at <= ?)
+                   OR (status = 'leased' AND lease_expires < ? AND attempts < ?)
+                ORDER BY available_at
+                LIMIT 1
+            """, (now, now, self.max_attempts)).fetchone()
+
+            if row is None:
+                return None
+
+            attempts = row['attempts'] + 1
+            conn.execute("""
+                UPDATE jobs
+                SET status = 'leased', attempts = ?, lease_owner = ?,
+                    lease_expires = ?, updated_at = ?
+                WHERE job_id = ?
+            """, (attempts, worker_id, now + self.visibility_timeout, now, row['job_id']))
+
+        job = json.loads(row['payload'])
+        job['jobId'] = row['job_id']
+        job['attempts'] = attempts
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """
+        Extend a lease held by this worker.
+
+        Returns:
+            False if the lease was lost (expired and taken by another node)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET lease_expires = ?, updated_at = ?
+                WHERE job_id = ? AND lease_owner = ? AND status = 'leased'
+            """, (now + self.visibility_timeout, now, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str) -> bool:
+        """Mark a leased job as done; False if this worker no longer holds the lease"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET status = 'done', lease_owner = NULL,
+                    lease_expires = NULL, updated_at = ?
+                WHERE job_id = ? AND lease_owner = ? AND status = 'leased'
+            """, (now, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> Optional[bool]:
+        """
+        Record a failed attempt.
+
+        The job is re-queued with a linear back-off while attempts remain,
+        otherwise it is marked failed.
+
+        Returns:
+            True if the job will be retried, False if it is marked failed,
+            None if this worker no longer holds the lease
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT attempts FROM jobs
+                WHERE job_id = ? AND lease_owner = ? AND status = 'leased'
+            """, (job_id, worker_id)).fetchone()
+
+            if row is None:
+                return None
+
+            retry = row['attempts'] < self.max_attempts
+            conn.execute("""
+                UPDATE jobs
+                SET status = ?, lease_owner = NULL, lease_expires = NULL,
+                    available_at = ?, last_error = ?, updated_at = ?
+                WHERE job_id = ?
+            """, (
+                'queued' if retry else 'failed',
+                now + self.retry_delay * row['attempts'],
+                error,
+                now,
+                job_id
+            ))
+            return retry
+
+    def reap_expired(self) -> List[Dict]:
+        """
+        Fail jobs whose final lease expired (the node crashed on every attempt).
+
+        Returns:
+            The jobs that were marked failed, so callers can report them
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute("""
+                SELECT job_id, payload, attempts FROM jobs
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, self.max_attempts)).fetchall()
+
+            conn.executemany("""
+                UPDATE jobs
+                SET status = 'failed', lease_owner = NULL, lease_expires = NULL,
+                    last_error = 'LEASE_EXPIRED', updated_at = ?
+                WHERE job_id = ?
+            """, [(now, row['job_id']) for row in rows])
+
+        jobs = []
+        for row in rows:
+            job = json.loads(row['payload'])
+            job['jobId'] = row['job_id']
+            job['attempts'] = row['attempts']
+            jobs.append(job)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the queue record for a job"""
+        with self._read() as conn:
+            row = conn.execute(
+                'SELECT job_id, status, attempts, lease_owner, last_error FROM jobs WHERE job_id = ?',
+                (job_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {
+            'jobId': row['job_id'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'leaseOwner': row['lease_owner'],
+            'lastError': row['last_error']
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Count jobs by status"""
+        with self._read() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
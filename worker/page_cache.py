@@ -0,0 +1,122 @@
+"""
+Page Cache Module
+Stores extracted page text keyed by a fingerprint of the page content.
+
+Revised uploads of the same deck share most of their pages, so text
+extracted once can be reused by any later document with an identical page.
+"""
+
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+
+class PageCache:
+    """SQLite-backed map from page fingerprint to extracted text"""
+
+    def __init__(self, db_path: str, max_entries: int = 50000):
+        """
+        Initialize the cache, creating the table if needed.
+
+        Args:
+            db_path: SQLite file (may live on the shared worker volume)
+            max_entries: Pages kept before the least recently used are pruned
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    fingerprint TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_last_used ON pages (last_used)')
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements inside a write-locked transaction"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _read(self):
+        """Open a connection for reads; no write lock, so lookups never queue"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, fingerprints: Iterable[str]) -> Dict[str, str]:
+        """
+        Look up cached text for a batch of page fingerprints.
+
+        Read-only: pass the hits to put_many as touched to keep them from
+        being pruned.
+
+        Returns:
+            Dict of fingerprint -> text for the pages found
+        """
+        keys = list(set(fingerprints))
+        if not keys:
+            return {}
+
+        found = {}
+        with self._read() as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT fingerprint, text FROM pages WHERE fingerprint IN ({placeholders})',
+                    batch
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, pages: Iterable[Tuple[str, str]], touched: Iterable[str] = ()) -> None:
+        """
+        Store (fingerprint, text) pairs and prune the oldest entries.
+
+        Args:
+            pages: Newly extracted pages
+            touched: Fingerprints reused since the last write; their
+                last_used is bumped in the same transaction
+        """
+        now = time.time()
+        rows = [(fingerprint, text, now) for fingerprint, text in pages]
+        touched = [(now, fingerprint) for fingerprint in set(touched)]
+        if not rows and not touched:
+            return
+
+        with self._transaction() as conn:
+            conn.executemany('UPDATE pages SET last_used = ? WHERE fingerprint = ?', touched)
+            conn.executemany(
+                'INSERT OR REPLACE INTO pages (fingerprint, text, last_used) VALUES (?, ?, ?)',
+                rows
+            )
+            conn.execute("""
+                DELETE FROM pages WHERE fingerprint IN (
+                    SELECT fingerprint FROM pages
+                    ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
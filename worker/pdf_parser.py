@@ -3,15 +3,27 @@ PDF Parser Module
 Extracts text and metadata from PDF files using pdfplumber.
 """
 
-import re
+import hashlib
 from typing import Dict, List, Optional
+from text_normalizer import TextNormalizer, is_heading
 
 
 class PDFParser:
     """Extract text and metadata from PDF files"""
     
-    def __init__(self):
+    # Back-references that would pull the whole page tree into a fingerprint,
+    # and stream encoding keys (stream data is hashed decoded)
+    SKIPPED_KEYS = frozenset({'Parent', 'P', 'Length', 'Filter', 'DecodeParms'})
+    
+    def __init__(self, page_cache=None):
+        """
+        Args:
+            page_cache: Optional PageCache; pages whose content fingerprint
+                is already cached are not re-extracted
+        """
         self.min_text_density = 50  # Minimum chars per page to not be "scanned"
+        self.page_cache = page_cache
+        self.normalizer = TextNormalizer()
     
     def parse(self, pdf_path: str) -> Dict:
         """
@@ -41,23 +53,28 @@ class PDFParser:
                         'metadata': {'pages': page_count}
                     }
                 
+                memo = {}  # Shared resources (fonts, forms) are hashed once per document
+                fingerprints = [self._pdfplumber_fingerprint(page, memo) for page in pdf.pages]
+                cached = self._cache_lookup(fingerprints)
+                new_pages = []
+                
                 for i, page in enumerate(pdf.pages):
-                    page_text = page.extract_text() or ''
+                    fingerprint = fingerprints[i]
+                    if fingerprint in cached:
+                        page_text = cached[fingerprint]
+                    else:
+                        page_text = page.extract_text() or ''
+                        if fingerprint:
+                            new_pages.append((fingerprint, page_text))
                     
                     # Check for scanned PDF (low text density)
                     if i < 3 and len(page_text.strip()) < self.min_text_density:
                         # First few pages have very little text
                         pass
                     
-                    # Extract potential headings (lines in ALL CAPS or starting with numbers)
-                    lines = page_text.split('\n')
-                    for line in lines:
-                        clean_line = line.strip()
-                        if self._is_heading(clean_line):
-                            headings.append({
-                                'text': clean_line,
-                                'page': i + 1
-                            })
+                    # Clean the page and extract potential headings together
+                    page_text, page_headings = self.normalizer.normalize_page(page_text, i + 1)
+                    headings.extend(page_headings)
                     
                     full_text.append(page_text)
                     word_count += len(page_text.split())
@@ -65,6 +82,7 @@ class PDFParser:
                 # Get metadata
                 metadata = pdf.metadata or {}
             
+            self._cache_store(new_pages, cached)
             combined_text = '\n\n'.join(full_text)
             
             # Check if document appears to be scanned (very low text)
@@ -82,7 +100,8 @@ class PDFParser:
                     'author': metadata.get('Author', ''),
                     'pages': page_count,
                     'wordCount': word_count,
-                    'creationDate': str(metadata.get('CreationDate', ''))
+                    'creationDate': str(metadata.get('CreationDate', '')),
+                    **self._reuse_metadata(fingerprints, cached)
                 }
             }
             
@@ -105,24 +124,41 @@ class PDFParser:
                 }
             
             full_text = []
+            headings = []
             word_count = 0
             
-            for page in reader.pages:
-                text = page.extract_text() or ''
+            memo = {}
+            fingerprints = [self._pypdf2_fingerprint(page, memo) for page in reader.pages]
+            cached = self._cache_lookup(fingerprints)
+            new_pages = []
+            
+            for i, page in enumerate(reader.pages):
+                fingerprint = fingerprints[i]
+                if fingerprint in cached:
+                    text = cached[fingerprint]
+                else:
+                    text = page.extract_text() or ''
+                    if fingerprint:
+                        new_pages.append((fingerprint, text))
+                text, page_headings = self.normalizer.normalize_page(text, i + 1)
+                headings.extend(page_headings)
                 full_text.append(text)
                 word_count += len(text.split())
             
             # Get metadata
             meta = reader.metadata or {}
             
+            self._cache_store(new_pages, cached)
+            
             return {
                 'text': '\n\n'.join(full_text),
-                'headings': [],
+                'headings': headings,
                 'metadata': {
                     'title': meta.get('/Title', ''),
                     'author': meta.get('/Author', ''),
                     'pages': page_count,
-                    'wordCount': word_count
+                    'wordCount': word_count,
+                    **self._reuse_metadata(fingerprints, cached)
                 }
             }
             
@@ -132,22 +168,144 @@ class PDFParser:
                 'metadata': {}
             }
     
-    def _is_heading(self, text: str) -> bool:
-        """Check if a line is likely a heading"""
-        if not text or len(text) > 100:
-            return False
+    def _hash_page(self, contents: List[bytes], resources: List[str], size) -> str:
+        """Fingerprint a page from its decoded content streams, resources and size"""
+        digest = hashlib.sha256()
+        digest.update(repr(size).encode())
+        # Resources decide what the content stream draws: fonts map bytes to
+        # text and form XObjects (q /Fm0 Do Q) carry the actual page content
+        digest.update('\x00'.join(sorted(resources)).encode())
+        for data in contents:
+            digest.update(b'\x00')
+            digest.update(data)
+        return digest.hexdigest()
+    
+    def _pdfplumber_fingerprint(self, page, memo: Optional[Dict] = None) -> Optional[str]:
+        """Fingerprint a pdfplumber page; None if it can't be read"""
+        if not self.page_cache:
+            return None
+        try:
+            from pdfminer.pdftypes import resolve1
+            
+            obj = page.page_obj
+            contents = [resolve1(stream).get_data() for stream in (obj.contents or [])]
+            resources = self._pdfminer_digest(obj.resources or {}, {} if memo is None else memo)
+            return self._hash_page(contents, [resources], (page.width, page.height))
+        except Exception:
+            return None
+    
+    def _pdfminer_digest(self, obj, memo: Dict) -> str:
+        """Recursively hash a pdfminer object: dicts, arrays and stream data"""
+        from pdfminer.pdftypes import PDFObjRef, PDFStream
+        from pdfminer.psparser import PSLiteral
         
-        # Check for common heading patterns
-        patterns = [
-            r'^[A-Z][A-Z\s]{5,}$',  # ALL CAPS
-            r'^(?:Chapter|Section|Part)\s+\d+',  # Chapter/Section numbers
-            r'^\d+\.\s+[A-Z]',  # Numbered headings
-            r'^[IVX]+\.\s+',  # Roman numerals
-        ]
+        if isinstance(obj, PDFObjRef):
+            if obj.objid not in memo:
+                memo[obj.objid] = f'cycle:{obj.objid}'  # Placeholder while recursing
+                memo[obj.objid] = self._pdfminer_digest(obj.resolve(), memo)
+            return memo[obj.objid]
         
-        for pattern in patterns:
-            if re.match(pattern, text, re.IGNORECASE):
-                return True
+        digest = hashlib.sha256()
+        if isinstance(obj, PDFStream):
+            digest.update(b's' + self._pdfminer_digest(obj.attrs, memo).encode())
+            digest.update(obj.get_data())
+        elif isinstance(obj, dict):
+            digest.update(b'd')
+            for key in sorted(obj, key=str):
+                if str(key) in self.SKIPPED_KEYS:
+                    continue
+                digest.update(f'{key}='.encode() + self._pdfminer_digest(obj[key], memo).encode())
+        elif isinstance(obj, (list, tuple)):
+            digest.update(b'a')
+            for item in obj:
+                digest.update(self._pdfminer_digest(item, memo).encode())
+        elif isinstance(obj, PSLiteral):
+            digest.update(b'n' + str(obj.name).encode())
+        elif isinstance(obj, bytes):
+            digest.update(b'b' + obj)
+        else:
+            digest.update(repr(obj).encode())
+        return digest.hexdigest()
+    
+    def _pypdf2_fingerprint(self, page, memo: Optional[Dict] = None) -> Optional[str]:
+        """Fingerprint a PyPDF2 page; None if it can't be read"""
+        if not self.page_cache:
+            return None
+        try:
+            stream = page.get_contents()
+            contents = [stream.get_data()] if stream is not None else []
+            # Resources may be inherited from an ancestor /Pages node
+            node = page
+            while node is not None and '/Resources' not in node:
+                parent = node.get('/Parent')
+                node = parent.get_object() if parent is not None else None
+            resources = node['/Resources'] if node is not None else {}
+            digest = self._pypdf2_digest(resources, {} if memo is None else memo)
+            return self._hash_page(contents, [digest], tuple(float(v) for v in page.mediabox))
+        except Exception:
+            return None
+    
+    def _pypdf2_digest(self, obj, memo: Dict) -> str:
+        """Recursively hash a PyPDF2 object: dicts, arrays and stream data"""
+        from PyPDF2.generic import IndirectObject, StreamObject
         
-        return False
-
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in memo:
+                memo[key] = f'cycle:{obj.idnum}'  # Placeholder while recursing
+                memo[key] = self._pypdf2_digest(obj.get_object(), memo)
+            return memo[key]
+        
+        digest = hashlib.sha256()
+        if isinstance(obj, StreamObject):
+            attrs = {k: v for k, v in obj.items()}
+            digest.update(b's' + self._pypdf2_digest(attrs, memo).encode())
+            digest.update(obj.get_data())
+        elif isinstance(obj, dict):
+            digest.update(b'd')
+            for key in sorted(obj, key=str):
+                if str(key).lstrip('/') in self.SKIPPED_KEYS:
+                    continue
+                digest.update(f'{key}='.encode() + self._pypdf2_digest(obj[key], memo).encode())
+        elif isinstance(obj, list):
+            digest.update(b'a')
+            for item in obj:
+                digest.update(self._pypdf2_digest(item, memo).encode())
+        elif isinstance(obj, bytes):
+            digest.update(b'b' + obj)
+        else:
+            digest.update(repr(obj).encode())
+        return digest.hexdigest()
+    
+    def _reuse_metadata(self, fingerprints: List[Optional[str]], cached: Dict[str, str]) -> Dict:
+        """pagesReused/reuseRatio metadata; empty when the page cache is disabled"""
+        if not self.page_cache:
+            return {}
+        pages_reused = sum(1 for fp in fingerprints if fp in cached)
+        return {
+            'pagesReused': pages_reused,
+            'reuseRatio': round(pages_reused / len(fingerprints), 3) if fingerprints else 0.0
+        }
+    
+    def _cache_lookup(self, fingerprints: List[Optional[str]]) -> Dict[str, str]:
+        """Fetch cached text for the fingerprinted pages"""
+        if not self.page_cache:
+            return {}
+        try:
+            return self.page_cache.get_many(fp for fp in fingerprints if fp)
+        except Exception as e:
+            print(f"[PDFParser] Page cache lookup failed: {e}")
+            return {}
+    
+    def _cache_store(self, pages: List, reused: Dict[str, str]) -> None:
+        """Save newly extracted pages and mark reused ones as recently used"""
+        if not self.page_cache or not (pages or reused):
+            return
+        try:
+            self.page_cache.put_many(pages, touched=reused)
+        except Exception as e:
+            print(f"[PDFParser] Page cache update failed: {e}")
+    
+    def _is_heading(self, text: str) -> bool:
+        """Check if a line is likely a heading"""
+        return is_heading(text)
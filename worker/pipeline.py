@@ -0,0 +1,92 @@
+"""
+Pipeline Module
+Parses, chunks and optionally compresses a PDF.
+
+Kept free of any web framework so both the Flask worker and the async
+worker's process pool can import it.
+"""
+
+import os
+from typing import Dict
+from dotenv import load_dotenv
+from pdf_parser import PDFParser
+from text_chunker import TextChunker
+from page_cache import PageCache
+from chunk_compressor import ChunkCompressor
+
+load_dotenv()
+
+# Extracted page text keyed by page fingerprint, reused across revised
+# uploads. Opt-in: the file holds every user's text, so it belongs on a
+# data volume (docker-compose uses /app/jobs/pages.db), not the source tree.
+PAGE_CACHE_PATH = os.getenv('PAGE_CACHE_PATH')
+
+
+def _compression_ratio(value) -> float:
+    """Parse COMPRESSION_RATIO; 0 means disabled, otherwise it must be in (0, 1]"""
+    if not value:
+        return 0.0
+    ratio = float(value)
+    if not 0 < ratio <= 1:
+        raise ValueError(f"COMPRESSION_RATIO must be in (0, 1], got {value!r} (use 0.6 for 60%)")
+    return ratio
+
+
+# Optional extractive compression: fraction of sentence words kept per
+# chunk before it is sent to the backend (e.g. 0.6). Empty disables.
+COMPRESSION_RATIO = _compression_ratio(os.getenv('COMPRESSION_RATIO'))
+
+# Created on first use so each pool process opens its own handle
+_page_cache = None
+
+
+def get_page_cache():
+    """Return this process's PageCache, or None when disabled"""
+    global _page_cache
+    if _page_cache is None and PAGE_CACHE_PATH:
+        _page_cache = PageCache(PAGE_CACHE_PATH)
+    return _page_cache
+
+
+def parse_and_chunk(job_id: str, pdf_path: str) -> Dict:
+    """
+    Run the CPU-bound part of a job.
+    
+    Returns:
+        Dict with metadata and chunks, or error and metadata
+    """
+    # Parse PDF
+    print(f"[Worker] Starting PDF parsing for job {job_id}", flush=True)
+    parser = PDFParser(page_cache=get_page_cache())
+    result = parser.parse(pdf_path)
+    print(f"[Worker] PDF parsing complete, result keys: {list(result.keys())}", flush=True)
+    metadata = result.get('metadata', {})
+    if 'reuseRatio' in metadata:
+        print(f"[Worker] Reused {metadata['pagesReused']}/{metadata['pages']} cached pages "
+              f"(ratio {metadata['reuseRatio']}) for job {job_id}", flush=True)
+    
+    if result.get('error'):
+        print(f"[Worker] PDF parsing error: {result['error']}")
+        return {'error': result['error'], 'metadata': metadata}
+    
+    # Chunk text with headings and page count for better titles/ranges
+    print(f"[Worker] Starting text chunking, text length: {len(result.get('text', ''))}")
+    chunker = TextChunker(target_words=600)
+    chunks = chunker.chunk(
+        result['text'],
+        result.get('headings', []),
+        metadata.get('pages'),
+        normalized=True
+    )
+    print(f"[Worker] Created {len(chunks)} chunks")
+    
+    if COMPRESSION_RATIO:
+        chunks = ChunkCompressor(ratio=COMPRESSION_RATIO).compress(chunks)
+        original = sum(c['originalWordCount'] for c in chunks)
+        compressed = sum(c['wordCount'] for c in chunks)
+        print(f"[Worker] Compressed chunks from {original} to {compressed} words")
+    
+    return {
+        'metadata': metadata,
+        'chunks': chunks
+    }
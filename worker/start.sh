@@ -1,5 +1,12 @@
 #!/bin/bash
-# Railway start script for worker
+# Start script for the worker (Railway and the Docker image)
 PORT=${PORT:-5000}
-gunicorn -w 1 -b 0.0.0.0:$PORT worker:app
-
+if [ "$WORKER_MODE" = "async" ]; then
+    # asyncio server: non-blocking uploads/callbacks, parsing in a process pool
+    exec python async_worker.py
+fi
+# Threaded so uploads are served concurrently; the timeout must outlast an
+# in-request parse plus callback (send_callback waits up to 60s, the
+# backend up to 120s)
+exec gunicorn -w 1 -k gthread --threads ${GUNICORN_THREADS:-8} --timeout 180 \
+    -b 0.0.0.0:$PORT worker:app
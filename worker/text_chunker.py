@@ -5,6 +5,7 @@ Splits text into manageable chunks for AI processing.
 
 import re
 from typing import List, Dict, Optional
+from text_normalizer import TextNormalizer
 
 
 class TextChunker:
@@ -22,8 +23,10 @@ class TextChunker:
         self.target_words = target_words
         self.min_words = min_words
         self.max_words = max_words
+        self.normalizer = TextNormalizer()
     
-    def chunk(self, text: str, headings: Optional[List[Dict]] = None, pages: Optional[int] = None) -> List[Dict]:
+    def chunk(self, text: str, headings: Optional[List[Dict]] = None, pages: Optional[int] = None,
+              normalized: bool = False) -> List[Dict]:
         """
         Split text into chunks.
         
@@ -33,6 +36,7 @@ class TextChunker:
         Args:
             text: Full document text
             headings: Optional list of detected headings
+            normalized: Skip cleaning when text already came from TextNormalizer
             
         Returns:
             List of chunk dictionaries with text and metadata
@@ -41,7 +45,7 @@ class TextChunker:
             return []
         
         # Clean up text
-        text = self._clean_text(text)
+        text = text.strip() if normalized else self._clean_text(text)
         
         # Try to split by headings first
         if headings and len(headings) > 1:
@@ -55,15 +59,7 @@ class TextChunker:
     
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        text = re.sub(r' {2,}', ' ', text)
-        
-        # Remove page numbers and headers (common patterns)
-        text = re.sub(r'\n\d+\n', '\n', text)
-        text = re.sub(r'Page \d+ of \d+', '', text)
-        
-        return text.strip()
+        return self.normalizer.normalize(text).strip()
     
     def _split_by_headings(self, text: str, headings: List[Dict], pages: Optional[int]) -> List[Dict]:
         """Split text using detected headings as boundaries"""
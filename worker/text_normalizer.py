@@ -0,0 +1,148 @@
+"""
+Text Normalizer Module
+Cleans extracted PDF text and finds heading candidates together.
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+
+# Ligatures, exotic spaces and invisible characters that PDF extraction
+# leaves behind, replaced in one regex scan per page (str.translate with
+# string values is several times slower on long pages).
+CHAR_MAP = {
+    '\ufb00': 'ff',
+    '\ufb01': 'fi',
+    '\ufb02': 'fl',
+    '\ufb03': 'ffi',
+    '\ufb04': 'ffl',
+    '\ufb05': 'ft',
+    '\ufb06': 'st',
+    '\u00a0': ' ',  # no-break space
+    **{chr(c): ' ' for c in range(0x2000, 0x200b)},  # en/em/thin/hair spaces
+    '\u202f': ' ',
+    '\u205f': ' ',
+    '\u3000': ' ',
+    '\u200b': '',  # zero-width space/joiners
+    '\u200c': '',
+    '\u200d': '',
+    '\u2060': '',
+    '\ufeff': '',
+    '\u00ad': '',  # soft hyphen
+}
+
+SPECIAL_CHARS = re.compile('[' + ''.join(CHAR_MAP) + ']')
+
+HEADING_PATTERN = re.compile(
+    r'^(?:'
+    r'[A-Z][A-Z\s]{5,}$'  # ALL CAPS
+    r'|(?:Chapter|Section|Part)\s+\d+'  # Chapter/Section numbers
+    r'|\d+\.\s+[A-Z]'  # Numbered headings
+    r'|[IVX]+\.\s+'  # Roman numerals
+    r')',
+    re.IGNORECASE
+)
+
+PAGE_OF_PATTERN = re.compile(r'Page \d+ of \d+')
+
+# Words that open real hyphenated compounds ("well-known", "self-balancing");
+# a line break after "well-" keeps its hyphen instead of being joined away.
+# Short syllables such as "re-" or "pre-" are left out: typesetters break
+# "re-sults" and "pre-sent" just as often.
+COMPOUND_PREFIXES = frozenset("""
+    well ill self non half semi anti pseudo cross high low long short
+    worst best first second third one two three trade real
+""".split())
+
+# Endings that mean the break was inside one word after all ("high-ly")
+WORD_ENDINGS = frozenset('s es ed en er ers est ing ings ish ly ness ment'.split())
+
+
+def is_heading(text: str) -> bool:
+    """Check if a cleaned line is likely a heading"""
+    if not text or len(text) > 100:
+        return False
+    return HEADING_PATTERN.match(text) is not None
+
+
+class TextNormalizer:
+    """Walk text line by line, cleaning it and emitting heading candidates"""
+
+    def normalize_page(self, text: str, page: Optional[int] = None) -> Tuple[str, List[Dict]]:
+        """
+        Normalize one page of text.
+
+        Ligatures, odd spaces and "Page X of Y" markers are replaced up
+        front with whole-page regex passes, skipped when there is nothing
+        to replace (running them per line measured slower). One walk over
+        the lines then collapses whitespace, drops page-number lines, joins
+        words hyphenated across line breaks, collapses blank-line runs into
+        one paragraph break and records heading candidates.
+
+        Args:
+            text: Raw page text
+            page: Page number recorded on heading candidates
+
+        Returns:
+            Tuple of (normalized text, list of {'text', 'page'} headings)
+        """
+        if not text:
+            return '', []
+
+        if not text.isascii():
+            text = SPECIAL_CHARS.sub(lambda m: CHAR_MAP[m.group()], text)
+            text = unicodedata.normalize('NFC', text)
+        if 'Page ' in text:
+            text = PAGE_OF_PATTERN.sub('', text)
+
+        out = []
+        headings = []
+        emit = out.append
+        match_heading = HEADING_PATTERN.match
+        pending = None  # Last non-blank line, held back for de-hyphenation
+        blank = False
+
+        for raw in text.split('\n'):
+            line = ' '.join(raw.split())
+
+            if not line:
+                blank = True
+                continue
+
+            # Standalone page numbers
+            if line.isdigit():
+                continue
+
+            if pending is not None:
+                # "exam-" + "ple ..." -> "example ..."; "well-" + "known ..."
+                # keeps its hyphen, as do fragments already hyphenated
+                if (pending[-1] == '-' and not blank and len(pending) > 1
+                        and pending[-2].isalpha() and line[0].islower()):
+                    fragment = pending[pending.rfind(' ') + 1:-1]
+                    if '-' in fragment or (
+                            fragment.lower() in COMPOUND_PREFIXES
+                            and line.split(' ', 1)[0].rstrip('.,;:!?)') not in WORD_ENDINGS):
+                        pending += line
+                    else:
+                        pending = pending[:-1] + line
+                    continue
+                emit(pending)
+                if len(pending) <= 100 and match_heading(pending):
+                    headings.append({'text': pending, 'page': page})
+                if blank:
+                    emit('')
+
+            pending = line
+            blank = False
+
+        if pending is not None:
+            out.append(pending)
+            if len(pending) <= 100 and HEADING_PATTERN.match(pending):
+                headings.append({'text': pending, 'page': page})
+
+        return '\n'.join(out), headings
+
+    def normalize(self, text: str) -> str:
+        """Normalize a whole document, keeping paragraph breaks between pages"""
+        return self.normalize_page(text)[0]
@@ -4,12 +4,16 @@ Extracts text from PDFs and sends chunks to the backend.
 """
 
 import os
+import sys
 import json
+import time
+import socket
+import threading
 import requests
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
-from pdf_parser import PDFParser
-from text_chunker import TextChunker
+from job_store import JobStore
+from pipeline import parse_and_chunk
 
 load_dotenv()
 
@@ -19,17 +23,36 @@ CALLBACK_URL = os.getenv('CALLBACK_URL', 'http://localhost:3001/api/callback')
 CALLBACK_SECRET = os.getenv('CALLBACK_SECRET', 'dev-secret-key')
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
 
+# Optional shared job store. When set, /parse only enqueues and every node
+# with access to the same file leases jobs from it.
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH')
+JOB_CONSUMERS = int(os.getenv('JOB_CONSUMERS', 1))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 120))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+
 # Ensure upload directory exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+job_store = None
+if JOB_STORE_PATH:
+    job_store = JobStore(
+        JOB_STORE_PATH,
+        visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+        max_attempts=JOB_MAX_ATTEMPTS
+    )
+
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
+    body = {
         'status': 'ok',
         'service': 'studypal-worker'
-    })
+    }
+    if job_store:
+        body['queue'] = job_store.stats()
+    return jsonify(body)
 
 
 @app.route('/parse', methods=['POST'])
@@ -90,53 +113,25 @@ def parse_pdf():
                 send_error_callback(job_id, callback_url, callback_secret, 'PDF file not found')
                 return jsonify({'error': 'PDF file not found'}), 404
         
-        # Parse PDF
-        print(f"[Worker] Starting PDF parsing for job {job_id}", flush=True)
-        import sys
-        sys.stdout.flush()
-        parser = PDFParser()
-        result = parser.parse(pdf_path)
-        print(f"[Worker] PDF parsing complete, result keys: {list(result.keys())}", flush=True)
-        sys.stdout.flush()
-        
-        if result.get('error'):
-            print(f"[Worker] PDF parsing error: {result['error']}")
-            send_error_callback(job_id, callback_url, callback_secret, result['error'])
-            return jsonify({'error': result['error']}), 422
-        
-        # Chunk text with headings and page count for better titles/ranges
-        print(f"[Worker] Starting text chunking, text length: {len(result.get('text', ''))}")
-        chunker = TextChunker(target_words=600)
-        chunks = chunker.chunk(
-            result['text'],
-            result.get('headings', []),
-            result.get('metadata', {}).get('pages')
-        )
-        print(f"[Worker] Created {len(chunks)} chunks")
-        
-        # Prepare response
-        response_data = {
-            'jobId': job_id,
-            'metadata': result['metadata'],
-            'chunks': chunks,
-            'status': 'success',
-            'secret': callback_secret
-        }
-        
-        # Send to callback
-        print(f"[Worker] Sending callback to {callback_url}")
-        send_callback(callback_url, response_data)
-        print(f"[Worker] Callback sent successfully")
-        
-        return jsonify({
-            'success': True,
-            'jobId': job_id,
-            'chunkCount': len(chunks)
-        })
+        # Hand off to the shared queue; any node may pick it up
+        if job_store:
+            job_store.enqueue(job_id, {
+                'filePath': pdf_path,
+                'callbackUrl': callback_url,
+                'callbackSecret': callback_secret
+            })
+            print(f"[Worker] Job {job_id} queued in {JOB_STORE_PATH}", flush=True)
+            return jsonify({
+                'success': True,
+                'jobId': job_id,
+                'status': 'queued'
+            }), 202
+
+        body, status_code = process_job(job_id, pdf_path, callback_url, callback_secret)
+        return jsonify(body), status_code
         
     except Exception as e:
         import traceback
-        import sys
         error_trace = traceback.format_exc()
         print(f"[Worker] ERROR processing PDF: {e}", flush=True)
         print(f"[Worker] Traceback: {error_trace}", flush=True)
@@ -147,8 +142,136 @@ def parse_pdf():
         return jsonify({'error': str(e), 'traceback': error_trace}), 500
 
 
+def process_job(job_id, pdf_path, callback_url, callback_secret, still_leased=None):
+    """
+    Parse, chunk and deliver a single job.
+    
+    Returns a (response body, status code) pair. Unexpected exceptions are
+    left to the caller so the queue consumer can retry them.
+    
+    still_leased is checked by queue consumers right before any callback;
+    if it returns False another node owns the job and will report it, so
+    nothing is sent and the body has leaseLost set.
+    """
+    result = parse_and_chunk(job_id, pdf_path)
+    
+    if still_leased and not still_leased():
+        return {'jobId': job_id, 'leaseLost': True}, 409
+    
+    if result.get('error'):
+        send_error_callback(job_id, callback_url, callback_secret, result['error'])
+        return {'error': result['error']}, 422
+    
+    chunks = result['chunks']
+    
+    # Prepare response
+    response_data = {
+        'jobId': job_id,
+        'metadata': result['metadata'],
+        'chunks': chunks,
+        'status': 'success',
+        'secret': callback_secret
+    }
+    
+    # Send to callback
+    print(f"[Worker] Sending callback to {callback_url}")
+    delivered = send_callback(callback_url, response_data)
+    if delivered:
+        print(f"[Worker] Callback sent successfully")
+    
+    return {
+        'success': True,
+        'jobId': job_id,
+        'chunkCount': len(chunks),
+        'callbackDelivered': delivered
+    }, 200
+
+
+def run_job_consumer(worker_id):
+    """
+    Lease jobs from the shared store and process them until the process exits.
+    
+    If this node crashes the lease lapses and another node picks the job
+    up; exceptions and undelivered callbacks are retried up to
+    JOB_MAX_ATTEMPTS.
+    """
+    print(f"[Queue] Consumer {worker_id} polling {JOB_STORE_PATH}", flush=True)
+    while True:
+        try:
+            for dead in job_store.reap_expired():
+                print(f"[Queue] Job {dead['jobId']} lease expired after {dead['attempts']} attempts", flush=True)
+                send_error_callback(dead['jobId'], dead['callbackUrl'], dead['callbackSecret'], 'LEASE_EXPIRED')
+
+            job = job_store.lease(worker_id)
+        except Exception as e:
+            print(f"[Queue] Store unavailable: {e}", flush=True)
+            job = None
+
+        if not job:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+
+        print(f"[Queue] {worker_id} leased job {job['jobId']} (attempt {job['attempts']}/{JOB_MAX_ATTEMPTS})", flush=True)
+        run_leased_job(job, worker_id)
+
+
+def run_leased_job(job, worker_id):
+    """
+    Process one job leased by worker_id and record the outcome in the store.
+    
+    A heartbeat thread renews the lease while the job runs. Once the lease
+    is lost no callback is sent: the node that took the job over reports it.
+    """
+    job_id = job['jobId']
+    stop = threading.Event()
+    lost = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(JOB_VISIBILITY_TIMEOUT / 3):
+            if not job_store.heartbeat(job_id, worker_id):
+                print(f"[Queue] Lost lease on job {job_id}", flush=True)
+                lost.set()
+                return
+
+    def still_leased():
+        # Renew once more before calling back: the lease can lapse
+        # between heartbeats and the job may already run elsewhere
+        if not lost.is_set() and not job_store.heartbeat(job_id, worker_id):
+            lost.set()
+        return not lost.is_set()
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        body, _ = process_job(job_id, job['filePath'], job['callbackUrl'], job['callbackSecret'], still_leased)
+        if body.get('leaseLost'):
+            print(f"[Queue] Job {job_id} taken over by another node, callback skipped", flush=True)
+            return
+        if body.get('callbackDelivered') is False:
+            raise RuntimeError('Callback delivery failed')
+        if not job_store.complete(job_id, worker_id):
+            print(f"[Queue] Lost lease on job {job_id} after its callback was sent", flush=True)
+    except Exception as e:
+        print(f"[Queue] Job {job_id} failed: {e}", flush=True)
+        retry = job_store.fail(job_id, worker_id, str(e))
+        if retry is None:
+            print(f"[Queue] Job {job_id} taken over by another node, error callback skipped", flush=True)
+        elif not retry:
+            send_error_callback(job_id, job['callbackUrl'], job['callbackSecret'], str(e))
+    finally:
+        stop.set()
+        beat.join()
+
+
+def start_job_consumers():
+    """Start JOB_CONSUMERS daemon threads leasing from the shared store"""
+    for i in range(JOB_CONSUMERS):
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{i}"
+        threading.Thread(target=run_job_consumer, args=(worker_id,), daemon=True).start()
+
+
 def send_callback(url, data):
-    """Send parsed data to backend callback"""
+    """Send parsed data to backend callback. Returns True on success."""
     try:
         print(f"[Callback] Sending POST to {url}")
         print(f"[Callback] Payload size: {len(str(data))} chars, chunks: {len(data.get('chunks', []))}")
@@ -156,11 +279,12 @@ def send_callback(url, data):
         print(f"[Callback] Response status: {response.status_code}")
         response.raise_for_status()
         print(f"[Callback] Callback sent successfully for job {data.get('jobId')}")
+        return True
     except Exception as e:
         import traceback
         print(f"[Callback] Callback failed: {e}")
         print(f"[Callback] Traceback: {traceback.format_exc()}")
-        # Retry logic could be added here
+        return False
 
 
 def send_error_callback(job_id, url, secret, error_message):
@@ -176,7 +300,28 @@ def send_error_callback(job_id, url, secret, error_message):
         print(f"Error callback failed: {e}")
 
 
+def _should_start_consumers():
+    """Start consumers once per serving process (skip the debug reloader parent)"""
+    if not job_store:
+        return False
+    if __name__ == '__main__':
+        return os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    return True
+
+
+if _should_start_consumers():
+    start_job_consumers()
+
+
 if __name__ == '__main__':
+    # Headless node: only lease jobs from the shared store, no HTTP
+    if '--consume' in sys.argv:
+        if not job_store:
+            sys.exit('JOB_STORE_PATH is required for --consume')
+        start_job_consumers()
+        while True:
+            time.sleep(3600)
+    
     port = int(os.getenv('PORT', 5000))
     # Simple ASCII banner to avoid Unicode issues on some Windows terminals
     print(f"==============================")
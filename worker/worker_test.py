@@ -5,9 +5,118 @@ Run with: pytest worker_test.py -v
 
 import pytest
 import os
+import re
+import glob
+import asyncio
 import tempfile
 from pdf_parser import PDFParser
 from text_chunker import TextChunker
+from job_store import JobStore
+from page_cache import PageCache
+from text_normalizer import TextNormalizer
+from chunk_compressor import ChunkCompressor
+
+
+HELVETICA = b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+
+
+def text_ops(lines):
+    """Content stream operators drawing one line of text per entry"""
+    return b''.join(
+        b'BT /F1 12 Tf 72 %d Td (%s) Tj ET\n' % (750 - 20 * i, line.encode())
+        for i, line in enumerate(lines)
+    )
+
+
+def write_pdf(path, objects):
+    """Write numbered PDF objects (catalog first) with a valid xref table"""
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for n, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (n, obj)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def write_deck(path, slides):
+    """Write a multi-page text PDF, one list of lines per page"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, HELVETICA]
+    kids = []
+    for lines in slides:
+        ops = text_ops(lines)
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(ops), ops))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << /Font << /F1 3 0 R >> >> >>' % len(objects))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+    write_pdf(path, objects)
+
+
+def write_xobject_pdf(path, slides, font=HELVETICA):
+    """
+    Write a PDF whose pages are all 'q /Fm0 Do Q', like pdfpages handouts.
+    
+    Each page's text lives in its own form XObject, so the page content
+    streams are byte-identical.
+    """
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, font]
+    kids = []
+    for lines in slides:
+        ops = text_ops(lines)
+        objects.append(b'<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Length %d >>\n'
+                       b'stream\n%s\nendstream' % (len(ops), ops))
+        form_id = len(objects)
+        content = b'q /Fm0 Do Q'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << /XObject << /Fm0 %d 0 R >> >> >>' % (len(objects), form_id))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+    write_pdf(path, objects)
+
+
+def make_slides(count, revised=None):
+    """Slide text long enough to pass the scanned-PDF check"""
+    slides = [
+        [f"Slide {n} point {k} covers topic {n} in some detail" for k in range(10)]
+        for n in range(1, count + 1)
+    ]
+    if revised:
+        slides[revised - 1][0] = f"Slide {revised} was revised with brand new material"
+    return slides
+
+
+def serve_async_worker(worker, monkeypatch, scenario):
+    """
+    Run scenario(client, callback_url, callbacks) against async_worker.
+    
+    callback_url points at a fake backend that records every callback.
+    """
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+    
+    async def main():
+        callbacks = []
+        
+        async def receive(request):
+            callbacks.append(await request.json())
+            return web.json_response({'ok': True})
+        
+        backend = web.Application()
+        backend.router.add_post('/api/callback', receive)
+        async with TestServer(backend) as backend_server:
+            callback_url = str(backend_server.make_url('/api/callback'))
+            monkeypatch.setattr(worker, 'CALLBACK_URL', callback_url)
+            async with TestClient(TestServer(worker.create_app())) as client:
+                await scenario(client, callback_url, callbacks)
+    
+    asyncio.run(main())
 
 
 class TestTextChunker:
@@ -71,6 +180,163 @@ class TestTextChunker:
             assert chunk['pageRange'][0] <= chunk['pageRange'][1]
 
 
+class TestTextNormalizer:
+    """Tests for text normalization"""
+    
+    def test_repairs_pdf_artifacts(self):
+        """Ligatures, odd spaces and hyphenated line breaks are repaired"""
+        normalizer = TextNormalizer()
+        text, _ = normalizer.normalize_page("An e\ufb03cient\u00a0 exam-\nple of \ufb02ow\u200b")
+        assert text == "An efficient example of flow"
+    
+    def test_keeps_hyphen_in_compounds(self):
+        """Real compounds split across lines keep their hyphen"""
+        normalizer = TextNormalizer()
+        text, headings = normalizer.normalize_page("Some well-\nknown results on self-\nbalancing state-of-\nthe-art trees")
+        assert text == "Some well-known results on self-balancing state-of-the-art trees"
+        assert headings == []
+        
+        text, headings = normalizer.normalize_page("Well-\nknown results")
+        assert text == "Well-known results"
+        assert headings == []
+        
+        # Ordinary breaks are still joined
+        text, _ = normalizer.normalize_page("high-\nly re-\nsults in multi-\nple trees")
+        assert text == "highly results in multiple trees"
+    
+    def test_removes_page_numbers_and_blank_runs(self):
+        """Page markers are dropped and blank runs become one paragraph break"""
+        normalizer = TextNormalizer()
+        text, _ = normalizer.normalize_page("First  para\n\n\n\n12\nPage 3 of 10\nSecond para")
+        assert text == "First para\n\nSecond para"
+    
+    def test_emits_headings_with_page(self):
+        """Heading candidates match the normalized text"""
+        normalizer = TextNormalizer()
+        text, headings = normalizer.normalize_page("  Chapter   2  Sorting\nBody text here, see above.", 7)
+        assert headings == [{'text': 'Chapter 2 Sorting', 'page': 7}]
+        assert headings[0]['text'] in text
+
+
+class TestChunkCompressor:
+    """Tests for extractive chunk compression"""
+    
+    TEXT = (
+        "CHAPTER TWO SORTING\n\n"
+        "Sorting arranges elements of a list in order. "
+        "Merge sort divides the list into halves and merges sorted halves. "
+        "Merge sort splits a list into two halves and then merges the sorted halves back. "
+        "Quick sort picks a pivot and partitions elements around it. "
+        "For example, consider the list of numbers shown on the slide. "
+        "Heap sort builds a heap and repeatedly extracts the maximum element.\n\n"
+        "Stable sorting keeps equal elements in their original order. "
+        "Merge sort is stable while quick sort is not stable in general."
+    )
+    
+    def test_compresses_and_reports_counts(self):
+        """Chunks shrink and keep original word counts in metadata"""
+        pytest.importorskip('numpy')
+        chunk = ChunkCompressor(ratio=0.5).compress([{'text': self.TEXT}])[0]
+        
+        assert chunk['originalWordCount'] == len(self.TEXT.split())
+        assert chunk['wordCount'] == len(chunk['text'].split())
+        assert chunk['wordCount'] < chunk['originalWordCount']
+    
+    def test_preserves_heading_and_order(self):
+        """Heading is kept and surviving sentences stay in original order"""
+        pytest.importorskip('numpy')
+        text = ChunkCompressor(ratio=0.5).compress_text(self.TEXT)
+        
+        assert text.startswith("CHAPTER TWO SORTING\n\n")
+        sentences = re.split(r'(?<=[.!?])\s+', text.split('\n\n', 1)[1].replace('\n', ' '))
+        assert len(sentences) >= 2
+        positions = [self.TEXT.index(sentence) for sentence in sentences]
+        assert positions == sorted(positions)
+        # Paraphrased duplicate is dropped
+        assert not ("divides the list" in text and "splits a list" in text)
+    
+    def test_bullet_slides_keep_lines(self):
+        """Unpunctuated bullets are ranked individually and keep their line breaks"""
+        pytest.importorskip('numpy')
+        slides = [
+            "BINARY SEARCH TREES\n- keys kept in sorted order\n- lookup walks one path from the root\n- unbalanced trees degrade to lists",
+            "HASH TABLES\n- hash function maps keys to buckets\n- collisions resolved by chaining\n- resize when load factor grows",
+            "GRAPH TRAVERSAL\n- breadth first search uses a queue\n- depth first search uses a stack\n- visited set prevents cycles",
+            "DYNAMIC PROGRAMMING\n- overlapping subproblems are cached\n- optimal substructure is required\n- tables are filled bottom up",
+            "GREEDY ALGORITHMS\n- pick the locally best option\n- exchange argument proves correctness\n- interval scheduling is the classic case",
+            "HEAPS\n- parent dominates its children\n- insert sifts the new key up\n- priority queues are built on heaps",
+        ]
+        text = '\n\n'.join(slides)
+        original_lines = text.split('\n')
+        
+        compressed = ChunkCompressor(ratio=0.5).compress_text(text)
+        
+        assert len(compressed.split()) < len(text.split())
+        # Every output line is an original line, in the original order
+        lines = [line for line in compressed.split('\n') if line]
+        positions = [original_lines.index(line) for line in lines]
+        assert positions == sorted(positions)
+        # No slide is reduced to a bare heading
+        for block in compressed.split('\n\n'):
+            assert len(block.split('\n')) >= 2
+        assert sum(1 for block in compressed.split('\n\n')) >= 4
+    
+    def test_sentence_case_lines_are_not_headings(self):
+        """Only real headings are pinned; first bullets and lines are ranked"""
+        units = ChunkCompressor()._segment(
+            "Graphs are everywhere\nRoads link cities\n\n"
+            "GRAPH BASICS\n- vertices and edges\n\n"
+            "1. Pick a start vertex\n2. Visit its neighbours\n\n"
+            "2. Traversal Order\nBreadth first visits by distance."
+        )
+        headings = [text for _, _, text, fixed, _ in units if fixed]
+        
+        assert headings == ["GRAPH BASICS", "2. Traversal Order"]
+    
+    def test_rejects_invalid_ratio(self):
+        """Ratios outside (0, 1] are rejected, not silently misapplied"""
+        for ratio in (0, -0.5, 60):
+            with pytest.raises(ValueError):
+                ChunkCompressor(ratio=ratio)
+    
+    def test_compression_ratio_setting(self):
+        """COMPRESSION_RATIO is validated when the pipeline loads"""
+        pytest.importorskip('dotenv')
+        from pipeline import _compression_ratio
+        
+        assert _compression_ratio(None) == 0.0
+        assert _compression_ratio('') == 0.0
+        assert _compression_ratio('0.6') == 0.6
+        assert _compression_ratio('1') == 1.0
+        for value in ('60', '0', '-0.2'):
+            with pytest.raises(ValueError):
+                _compression_ratio(value)
+    
+    def test_skips_paraphrased_examples(self):
+        """An example repeated in other words is kept only once"""
+        pytest.importorskip('numpy')
+        text = (
+            "Graphs model relationships between objects. "
+            "For example, a road map is a graph where cities are vertices. "
+            "Edges connect pairs of vertices and may carry weights. "
+            "As an example, a road network is a graph with cities as vertices. "
+            "Directed graphs give every edge a direction from one vertex to another. "
+            "Trees are connected graphs that contain no cycles. "
+            "Breadth-first search visits vertices in order of distance from the start. "
+            "Depth-first search follows each branch as far as possible before backtracking."
+        )
+        result = ChunkCompressor(ratio=0.5).compress_text(text)
+        
+        assert ("road map" in result) != ("road network" in result)
+        assert "Directed graphs" in result
+        assert "Trees are connected" in result
+    
+    def test_short_chunk_untouched(self):
+        """Chunks with too few sentences are not compressed"""
+        text = "One sentence here. Another one there."
+        assert ChunkCompressor().compress_text(text) == text
+
+
 class TestPDFParser:
     """Tests for PDF parsing"""
     
@@ -94,6 +360,84 @@ class TestPDFParser:
         assert parser._is_heading("") == False
         assert parser._is_heading("x" * 150) == False  # Too long
     
+    def test_page_fingerprint(self):
+        """Identical page content should hash the same, edits should not"""
+        parser = PDFParser()
+        a = parser._hash_page([b'BT (Slide 1) Tj ET'], ['F1=Helvetica'], (612, 792))
+        b = parser._hash_page([b'BT (Slide 1) Tj ET'], ['F1=Helvetica'], (612, 792))
+        c = parser._hash_page([b'BT (Slide 1, revised) Tj ET'], ['F1=Helvetica'], (612, 792))
+        d = parser._hash_page([b'BT (Slide 1) Tj ET'], ['F1=Times-Roman'], (612, 792))
+        assert a == b
+        assert len({a, c, d}) == 3
+    
+    def test_revised_deck_reuses_unchanged_pages(self, tmp_path):
+        """Only the revised page of a re-uploaded deck is extracted again"""
+        pytest.importorskip('pdfplumber')
+        write_deck(str(tmp_path / 'v1.pdf'), make_slides(4))
+        write_deck(str(tmp_path / 'v2.pdf'), make_slides(4, revised=3))
+        parser = PDFParser(page_cache=PageCache(str(tmp_path / 'pages.db')))
+        
+        first = parser.parse(str(tmp_path / 'v1.pdf'))
+        second = parser.parse(str(tmp_path / 'v2.pdf'))
+        
+        assert first['metadata']['pagesReused'] == 0
+        assert second['metadata']['pagesReused'] == 3
+        assert second['metadata']['reuseRatio'] == 0.75
+        assert "Slide 3 was revised" in second['text']
+        assert "Slide 3 point 0" not in second['text']
+        assert "Slide 4 point 9" in second['text']
+    
+    def test_xobject_pages_are_not_confused(self, tmp_path):
+        """Pages drawn via identical 'Do' streams are told apart by their XObjects"""
+        pytest.importorskip('pdfplumber')
+        path = str(tmp_path / 'handout.pdf')
+        write_xobject_pdf(path, make_slides(3))
+        parser = PDFParser(page_cache=PageCache(str(tmp_path / 'pages.db')))
+        
+        first = parser.parse(path)
+        second = parser.parse(path)
+        
+        assert second['metadata']['pagesReused'] == 3
+        assert second['text'] == first['text']
+        for n in (1, 2, 3):
+            assert f"Slide {n} point 0" in second['text']
+    
+    def test_xobject_fingerprints_differ_in_pypdf2(self, tmp_path):
+        """The PyPDF2 fallback fingerprints XObject pages apart too"""
+        PdfReader = pytest.importorskip('PyPDF2').PdfReader
+        path = str(tmp_path / 'handout.pdf')
+        write_xobject_pdf(path, make_slides(3))
+        parser = PDFParser(page_cache=PageCache(str(tmp_path / 'pages.db')))
+        
+        fingerprints = {parser._pypdf2_fingerprint(page) for page in PdfReader(path).pages}
+        assert len(fingerprints) == 3
+        assert None not in fingerprints
+    
+    def test_font_encoding_changes_fingerprint(self, tmp_path):
+        """Same BaseFont with a different encoding must not hit the cache"""
+        pytest.importorskip('pdfplumber')
+        win = str(tmp_path / 'win.pdf')
+        mac = str(tmp_path / 'mac.pdf')
+        write_xobject_pdf(win, make_slides(3), font=b'<< /Type /Font /Subtype /Type1 '
+                          b'/BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        write_xobject_pdf(mac, make_slides(3), font=b'<< /Type /Font /Subtype /Type1 '
+                          b'/BaseFont /Helvetica /Encoding /MacRomanEncoding >>')
+        parser = PDFParser(page_cache=PageCache(str(tmp_path / 'pages.db')))
+        
+        parser.parse(win)
+        assert parser.parse(mac)['metadata']['pagesReused'] == 0
+    
+    def test_no_reuse_metadata_without_cache(self, tmp_path):
+        """Reuse stats are only reported when the page cache is enabled"""
+        pytest.importorskip('pdfplumber')
+        path = str(tmp_path / 'deck.pdf')
+        write_deck(path, make_slides(3))
+        
+        metadata = PDFParser().parse(path)['metadata']
+        assert metadata['pages'] == 3
+        assert 'pagesReused' not in metadata
+        assert 'reuseRatio' not in metadata
+    
     def test_parse_missing_file(self):
         """Should handle missing file gracefully"""
         parser = PDFParser()
@@ -103,27 +447,20 @@ class TestPDFParser:
     
     @pytest.fixture
     def sample_pdf_path(self):
-        """Create a simple test PDF (requires reportlab)"""
-        try:
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            
-            fd, path = tempfile.mkstemp(suffix='.pdf')
-            os.close(fd)
-            
-            c = canvas.Canvas(path, pagesize=letter)
-            c.drawString(100, 750, "Test Document Title")
-            c.drawString(100, 700, "This is a test paragraph with some content.")
-            c.drawString(100, 650, "It contains multiple lines of text for testing.")
-            c.save()
-            
-            yield path
-            
-            # Cleanup
-            os.unlink(path)
-            
-        except ImportError:
-            pytest.skip("reportlab not installed")
+        """Create a simple test PDF"""
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        
+        write_deck(path, [[
+            "Test Document Title",
+            "This is a test paragraph with some content.",
+            "It contains multiple lines of text for testing."
+        ]])
+        
+        yield path
+        
+        # Cleanup
+        os.unlink(path)
     
     def test_parse_valid_pdf(self, sample_pdf_path):
         """Should parse valid PDF successfully"""
@@ -136,6 +473,367 @@ class TestPDFParser:
         assert result['metadata']['pages'] >= 1
 
 
+class TestJobStore:
+    """Tests for the shared job lease store"""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        return JobStore(str(tmp_path / 'jobs.db'), visibility_timeout=60, max_attempts=2, retry_delay=0)
+    
+    def test_lease_and_complete(self, store):
+        """A queued job is leased once and can be completed"""
+        assert store.enqueue('job-1', {'filePath': '/tmp/a.pdf'}) == True
+        
+        job = store.lease('node-a')
+        assert job['jobId'] == 'job-1'
+        assert job['filePath'] == '/tmp/a.pdf'
+        assert job['attempts'] == 1
+        
+        # Leased jobs are invisible to other nodes
+        assert store.lease('node-b') is None
+        assert store.heartbeat('job-1', 'node-a') == True
+        assert store.heartbeat('job-1', 'node-b') == False
+        
+        assert store.complete('job-1', 'node-a') == True
+        assert store.get('job-1')['status'] == 'done'
+    
+    def test_duplicate_enqueue_ignored_while_active(self, store):
+        """Re-submitting an active job does not reset it"""
+        store.enqueue('job-1', {})
+        store.lease('node-a')
+        assert store.enqueue('job-1', {}) == False
+        assert store.get('job-1')['status'] == 'leased'
+    
+    def test_expired_lease_is_taken_over(self, store):
+        """A crashed node's job is picked up by another node"""
+        store.visibility_timeout = -1
+        store.enqueue('job-1', {})
+        store.lease('node-a')
+        
+        job = store.lease('node-b')
+        assert job['jobId'] == 'job-1'
+        assert job['attempts'] == 2
+        assert store.heartbeat('job-1', 'node-a') == False
+        
+        # The original node can no longer finish or fail the job
+        assert store.complete('job-1', 'node-a') == False
+        assert store.fail('job-1', 'node-a', 'late') is None
+        assert store.get('job-1')['leaseOwner'] == 'node-b'
+        
+        # Out of attempts: reaped as failed
+        reaped = store.reap_expired()
+        assert [j['jobId'] for j in reaped] == ['job-1']
+        assert store.get('job-1')['status'] == 'failed'
+        assert store.lease('node-c') is None
+    
+    def test_fail_retries_then_gives_up(self, store):
+        """Failures are retried until max_attempts"""
+        store.enqueue('job-1', {})
+        store.lease('node-a')
+        assert store.fail('job-1', 'node-a', 'boom') == True
+        assert store.get('job-1')['status'] == 'queued'
+        
+        store.lease('node-b')
+        assert store.fail('job-1', 'node-b', 'boom again') == False
+        record = store.get('job-1')
+        assert record['status'] == 'failed'
+        assert record['lastError'] == 'boom again'
+        assert store.stats() == {'failed': 1}
+    
+    def test_reads_do_not_take_write_lock(self, store):
+        """get() and stats() work while another node holds the write lock"""
+        import sqlite3
+        
+        store.enqueue('job-1', {})
+        writer = sqlite3.connect(store.db_path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            assert store.get('job-1')['status'] == 'queued'
+            assert store.stats() == {'queued': 1}
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+
+
+class TestQueueConsumer:
+    """Tests for worker.run_leased_job against a real JobStore"""
+    
+    @pytest.fixture
+    def consumer(self, tmp_path, monkeypatch):
+        pytest.importorskip('flask')
+        pytest.importorskip('dotenv')
+        import worker
+        
+        store = JobStore(str(tmp_path / 'jobs.db'), visibility_timeout=60, max_attempts=2, retry_delay=0)
+        store.enqueue('job-1', {'filePath': '/tmp/a.pdf', 'callbackUrl': 'http://backend/cb', 'callbackSecret': 's'})
+        callbacks, errors = [], []
+        monkeypatch.setattr(worker, 'job_store', store)
+        monkeypatch.setattr(worker, 'parse_and_chunk', lambda job_id, path: {
+            'metadata': {'pages': 1},
+            'chunks': [{'text': 'Parsed text'}]
+        })
+        monkeypatch.setattr(worker, 'send_callback', lambda url, data: callbacks.append(data) or True)
+        monkeypatch.setattr(worker, 'send_error_callback', lambda job_id, url, secret, error: errors.append(error))
+        return worker, store, callbacks, errors
+    
+    def take_over_while_parsing(self, worker, store, monkeypatch, error=None):
+        """Lease job-1 to node-a, then let node-b take it over mid-parse"""
+        store.visibility_timeout = -1
+        job = store.lease('node-a')
+        store.visibility_timeout = 60
+        
+        def parse(job_id, path):
+            assert store.lease('node-b')['jobId'] == job_id
+            if error:
+                raise RuntimeError(error)
+            return {'metadata': {}, 'chunks': []}
+        
+        monkeypatch.setattr(worker, 'parse_and_chunk', parse)
+        return job
+    
+    def test_completes_and_calls_back(self, consumer):
+        """A successful job is called back once and marked done"""
+        worker, store, callbacks, errors = consumer
+        worker.run_leased_job(store.lease('node-a'), 'node-a')
+        
+        assert [c['jobId'] for c in callbacks] == ['job-1']
+        assert errors == []
+        assert store.get('job-1')['status'] == 'done'
+    
+    def test_lost_lease_skips_callback(self, consumer, monkeypatch):
+        """A node whose job was taken over does not call back"""
+        worker, store, callbacks, errors = consumer
+        job = self.take_over_while_parsing(worker, store, monkeypatch)
+        worker.run_leased_job(job, 'node-a')
+        
+        assert callbacks == []
+        assert errors == []
+        record = store.get('job-1')
+        assert record['status'] == 'leased'
+        assert record['leaseOwner'] == 'node-b'
+    
+    def test_lost_lease_skips_error_callback(self, consumer, monkeypatch):
+        """A failure after a takeover is not reported as the final one"""
+        worker, store, callbacks, errors = consumer
+        job = self.take_over_while_parsing(worker, store, monkeypatch, error='boom')
+        worker.run_leased_job(job, 'node-a')
+        
+        assert errors == []
+        record = store.get('job-1')
+        assert record['leaseOwner'] == 'node-b'
+        assert record['lastError'] is None
+    
+    def test_failed_callback_is_retried(self, consumer, monkeypatch):
+        """Undelivered callbacks are retried, then reported as an error"""
+        worker, store, callbacks, errors = consumer
+        monkeypatch.setattr(worker, 'send_callback', lambda url, data: False)
+        
+        worker.run_leased_job(store.lease('node-a'), 'node-a')
+        record = store.get('job-1')
+        assert record['status'] == 'queued'
+        assert record['lastError'] == 'Callback delivery failed'
+        assert errors == []
+        
+        worker.run_leased_job(store.lease('node-b'), 'node-b')
+        assert store.get('job-1')['status'] == 'failed'
+        assert errors == ['Callback delivery failed']
+
+
+class TestPageCache:
+    """Tests for the page fingerprint cache"""
+    
+    def test_round_trip(self, tmp_path):
+        """Stored pages are returned by fingerprint"""
+        cache = PageCache(str(tmp_path / 'pages.db'))
+        cache.put_many([('fp1', 'page one'), ('fp2', '')])
+        
+        assert cache.get_many(['fp1', 'fp2', 'missing']) == {'fp1': 'page one', 'fp2': ''}
+        assert cache.get_many([]) == {}
+    
+    def test_prunes_least_recently_used(self, tmp_path):
+        """Cache should not grow beyond max_entries"""
+        cache = PageCache(str(tmp_path / 'pages.db'), max_entries=2)
+        cache.put_many([('old', 'a')])
+        cache.put_many([('mid', 'b')])
+        cache.put_many([('new', 'c')])
+        
+        assert set(cache.get_many(['old', 'mid', 'new'])) == {'mid', 'new'}
+    
+    def test_touched_pages_survive_pruning(self, tmp_path):
+        """Reused pages passed as touched count as recently used"""
+        cache = PageCache(str(tmp_path / 'pages.db'), max_entries=2)
+        cache.put_many([('old', 'a')])
+        cache.put_many([('mid', 'b')])
+        cache.put_many([('new', 'c')], touched=['old'])
+        
+        assert set(cache.get_many(['old', 'mid', 'new'])) == {'old', 'new'}
+    
+    def test_lookup_does_not_take_write_lock(self, tmp_path):
+        """get_many works while another node holds the write lock"""
+        import sqlite3
+        
+        cache = PageCache(str(tmp_path / 'pages.db'))
+        cache.put_many([('fp1', 'page one')])
+        writer = sqlite3.connect(cache.db_path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            assert cache.get_many(['fp1']) == {'fp1': 'page one'}
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+
+
+class TestAsyncWorker:
+    """Tests for the aiohttp worker, served with aiohttp's test client"""
+    
+    @pytest.fixture
+    def worker(self, tmp_path, monkeypatch):
+        pytest.importorskip('aiohttp')
+        pytest.importorskip('dotenv')
+        import async_worker
+        
+        monkeypatch.setattr(async_worker, 'UPLOAD_DIR', str(tmp_path))
+        monkeypatch.setattr(async_worker, 'PARSE_PROCESSES', 1)
+        return async_worker
+    
+    @pytest.fixture
+    def deck(self, tmp_path):
+        pytest.importorskip('pdfplumber')
+        path = str(tmp_path / 'deck.pdf')
+        write_deck(path, make_slides(2))
+        return path
+    
+    def test_health(self, worker, monkeypatch):
+        """Health check reports async mode and a working pool"""
+        async def scenario(client, callback_url, callbacks):
+            response = await client.get('/health')
+            assert response.status == 200
+            body = await response.json()
+            assert body['status'] == 'ok'
+            assert body['mode'] == 'async'
+            assert body['pool'] == 'ok'
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+    
+    def test_parse_json(self, worker, deck, monkeypatch):
+        """A file path reference is parsed and the chunks are called back"""
+        async def scenario(client, callback_url, callbacks):
+            response = await client.post('/parse', json={
+                'jobId': 'job-json',
+                'filePath': deck,
+                'callbackUrl': callback_url,
+                'callbackSecret': 'secret'
+            })
+            assert response.status == 200
+            body = await response.json()
+            assert body['callbackDelivered'] == True
+            assert body['chunkCount'] >= 1
+            
+            assert len(callbacks) == 1
+            assert callbacks[0]['jobId'] == 'job-json'
+            assert callbacks[0]['status'] == 'success'
+            assert callbacks[0]['secret'] == 'secret'
+            assert callbacks[0]['metadata']['pages'] == 2
+            assert "Slide 2 point 9" in ' '.join(c['text'] for c in callbacks[0]['chunks'])
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+    
+    def test_parse_multipart_pdf_before_job_id(self, worker, deck, monkeypatch, tmp_path):
+        """The upload is kept even when the pdf field precedes jobId"""
+        from aiohttp import FormData
+        
+        async def scenario(client, callback_url, callbacks):
+            form = FormData()
+            with open(deck, 'rb') as f:
+                form.add_field('pdf', f.read(), filename='deck.pdf', content_type='application/pdf')
+            form.add_field('jobId', 'job-upload')
+            
+            response = await client.post('/parse', data=form)
+            assert response.status == 200
+            assert (await response.json())['jobId'] == 'job-upload'
+            assert callbacks[0]['status'] == 'success'
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+        assert os.path.exists(tmp_path / 'job-upload.pdf')
+        assert glob.glob(str(tmp_path / '*.part')) == []
+    
+    def test_parse_multipart_without_job_id_cleans_up(self, worker, monkeypatch, tmp_path):
+        """Rejected and replaced uploads leave no temporary files"""
+        from aiohttp import FormData
+        
+        async def scenario(client, callback_url, callbacks):
+            form = FormData()
+            form.add_field('pdf', b'%PDF-1.4 first', filename='a.pdf')
+            form.add_field('pdf', b'%PDF-1.4 second', filename='b.pdf')
+            
+            response = await client.post('/parse', data=form)
+            assert response.status == 400
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+        assert os.listdir(tmp_path) == []
+    
+    def test_parse_missing_file(self, worker, monkeypatch):
+        """A missing PDF returns 404 and sends an error callback"""
+        async def scenario(client, callback_url, callbacks):
+            response = await client.post('/parse', json={
+                'jobId': 'job-missing',
+                'filePath': '/nonexistent/file.pdf',
+                'callbackUrl': callback_url
+            })
+            assert response.status == 404
+            assert callbacks == [{
+                'jobId': 'job-missing',
+                'status': 'error',
+                'error': 'PDF file not found',
+                'secret': worker.CALLBACK_SECRET
+            }]
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+    
+    def test_lost_lease_skips_callback(self, worker, deck, monkeypatch):
+        """A consumer that lost its lease does not call back"""
+        async def scenario(client, callback_url, callbacks):
+            async def still_leased():
+                return False
+            
+            body, status = await worker.process_job(
+                client.app, 'job-1', deck, callback_url, 'secret', still_leased
+            )
+            assert status == 409
+            assert body['leaseLost'] == True
+            assert callbacks == []
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+    
+    def test_broken_pool_is_replaced(self, worker, monkeypatch):
+        """A dead parse process fails one job, then the pool recovers"""
+        from concurrent.futures.process import BrokenProcessPool
+        
+        async def scenario(client, callback_url, callbacks):
+            pool = client.app[worker.POOL]
+            loop = asyncio.get_running_loop()
+            with pytest.raises(BrokenProcessPool):
+                await loop.run_in_executor(pool.executor, os._exit, 1)
+            
+            response = await client.get('/health')
+            assert response.status == 503
+            assert (await response.json())['pool'] == 'broken'
+            
+            # The next job gets a fresh executor
+            assert await pool.run(abs, -3) == 3
+            response = await client.get('/health')
+            assert response.status == 200
+            
+            # A job that kills its process fails on its own
+            broken = pool.executor
+            with pytest.raises(RuntimeError, match='PARSER_CRASHED'):
+                await pool.run(os._exit, 1)
+            assert pool.executor is not broken
+            assert (await client.get('/health')).status == 200
+        
+        serve_async_worker(worker, monkeypatch, scenario)
+
+
 class TestIntegration:
     """Integration tests"""
     
@@ -173,8 +871,32 @@ class TestIntegration:
             assert 'index' in chunk
             assert 'wordCount' in chunk
             assert 'pageRange' in chunk
+    
+    def test_parse_and_chunk(self, tmp_path):
+        """The shared pipeline parses and chunks a PDF"""
+        pytest.importorskip('pdfplumber')
+        pytest.importorskip('dotenv')
+        from pipeline import parse_and_chunk
+        
+        path = str(tmp_path / 'deck.pdf')
+        write_deck(path, make_slides(3))
+        result = parse_and_chunk('job-1', path)
+        
+        assert 'error' not in result
+        assert result['metadata']['pages'] == 3
+        assert result['chunks']
+        text = ' '.join(chunk['text'] for chunk in result['chunks'])
+        assert "Slide 1 point 0" in text
+        assert "Slide 3 point 9" in text
+    
+    def test_parse_and_chunk_missing_file(self):
+        """Pipeline errors are returned, not raised"""
+        pytest.importorskip('dotenv')
+        from pipeline import parse_and_chunk
+        
+        result = parse_and_chunk('job-1', '/nonexistent/file.pdf')
+        assert result['error'].startswith('PARSING_FAILED')
 
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
-